@@ -1,224 +1,626 @@
 # database.py - Complete database functions for OSINT Pro Bot
 
+import asyncio
 import aiosqlite
-import json
-from datetime import datetime, timedelta
+import contextvars
+import functools
+import itertools
+import logging
+import orjson
+import queue
+import sqlite3
+import threading
+import time
+import zstandard
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
 
 DB_PATH = "osint_bot.db"  # अगर Persistent Disk use kar rahe ho to path change karein
+SCHEMA_VERSION = 2  # PRAGMA user_version; _migrate() purani files upgrade karta hai
+
+# Connection PRAGMAs (har connection pe sirf ek baar lagte hain)
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=memory",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA wal_autocheckpoint=1000",
+)
+# Read-only connections (WAL me writer ke saath parallel padh sakte hain)
+READER_PRAGMAS = (
+    "PRAGMA query_only=1",
+    "PRAGMA temp_store=memory",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA mmap_size=268435456",
+)
+READER_COUNT = 4
+
+# sqlite3 prepared-statement cache (default 128); hot statements neeche constants me hain
+STATEMENT_CACHE_SIZE = 256
+
+# Hot-path SQL (same string = same cached prepared statement, dobara parse nahi hota)
+SQL_UPDATE_USER = '''
+    INSERT INTO users (user_id, first_seen, last_seen, username, first_name, last_name)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET
+        last_seen=excluded.last_seen,
+        username=excluded.username,
+        first_name=excluded.first_name,
+        last_name=excluded.last_name
+'''
+SQL_GET_USER = 'SELECT user_id, first_seen, last_seen, total_lookups, username, first_name, last_name FROM users WHERE user_id = ? LIMIT 1'
+SQL_IS_BANNED = 'SELECT 1 FROM banned WHERE user_id = ? LIMIT 1'
+SQL_INSERT_LOOKUPS = 'INSERT INTO lookups (user_id, command, query, result, timestamp) VALUES '
+SQL_LOOKUP_ROW = '(?, ?, ?, ?, ?)'
+
+# Lookup batching (save_lookup queue me daalta hai, writer thread ek transaction me likhta hai)
+LOOKUP_BATCH_SIZE = 1000
+LOOKUP_FLUSH_INTERVAL = 0.2  # seconds
+# Batch inhi fixed sizes ke chunks me likha jata hai (bacha hua 1-row executemany se),
+# taaki har size ka ek hi prepared statement bane aur cache se reuse ho
+LOOKUP_INSERT_BUCKETS = (256, 32)
+# Busy/disk jaise errors pe poora batch itni baar dobara (delay har baar double)
+LOOKUP_RETRIES = 3
+LOOKUP_RETRY_DELAY = 0.5  # seconds
+
+# lookups.result zstd se compress hota hai (writer thread me, event loop pe nahi)
+ZSTD_LEVEL = 3
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_cctx = zstandard.ZstdCompressor(level=ZSTD_LEVEL)  # sirf writer thread use karta hai
+_dctx = zstandard.ZstdDecompressor()
+
+# WAL file ko periodically truncate karo taaki lagatar writes me bhi chhota rahe
+CHECKPOINT_INTERVAL = 300  # seconds
+
+# Shared connections: ek writer + READER_COUNT readers (ek hi baar open hote hain)
+_write_db = None
+_read_dbs = []
+_read_cycle = None
+_db_lock = asyncio.Lock()
+_write_lock = asyncio.Lock()  # writer connection pe ek time me ek hi transaction
+# is task ki chal rahi transaction: (db, commit ke baad chalne wale cache callbacks)
+_txn = contextvars.ContextVar('_txn', default=None)
+
+# In-memory caches (har message pe is_admin/is_banned ke liye DB tak na jana pade)
+BAN_CACHE_TTL = 60  # seconds
+BAN_CACHE_SIZE = 10_000
+_admin_ids = None   # set of admin user_ids, pehli call pe load hota hai
+_admin_gen = 0      # har admin change pe badhta hai (purana load cache overwrite na kare)
+_ban_cache = {}     # user_id -> (banned, expires_at)
+_ban_gen = 0
+
+# Lookup writer thread (plain sqlite3, aiosqlite ke per-call thread hop ke bina)
+_write_q = queue.Queue()
+_STOP = object()  # sentinel: pehle ke saare rows likh ke thread band ho jata hai
+_writer_thread = None
+_checkpoint_task = None
+
+async def _apply_pragmas(db, pragmas=PRAGMAS):
+    """Apply connection-level PRAGMAs and the Row factory once, right after opening."""
+    # Row: index (row[0]) aur naam (row["username"]) dono se access hota hai
+    db.row_factory = aiosqlite.Row
+    for pragma in pragmas:
+        await db.execute(pragma)
+
+async def get_db():
+    """Return the shared write connection, opening all connections on first use."""
+    global _write_db, _read_dbs, _read_cycle
+    if _write_db is None:
+        async with _db_lock:
+            if _write_db is None:
+                # Writer pehle open hota hai taaki DB file aur WAL mode ready ho
+                write_db = await aiosqlite.connect(DB_PATH, cached_statements=STATEMENT_CACHE_SIZE)
+                await _apply_pragmas(write_db)
+                read_dbs = []
+                for _ in range(READER_COUNT):
+                    read_db = await aiosqlite.connect(
+                        f"file:{DB_PATH}?mode=ro", uri=True, cached_statements=STATEMENT_CACHE_SIZE
+                    )
+                    await _apply_pragmas(read_db, READER_PRAGMAS)
+                    read_dbs.append(read_db)
+                _read_dbs = read_dbs
+                _read_cycle = itertools.cycle(read_dbs)
+                _write_db = write_db
+    return _write_db
+
+async def get_reader():
+    """Return the next read-only connection (round-robin)."""
+    await get_db()
+    return next(_read_cycle)
+
+@asynccontextmanager
+async def transaction():
+    """Group several writes into one BEGIN IMMEDIATE/COMMIT (rollback on error).
+
+    Write helpers called inside it (and nested transaction() blocks) join
+    the running transaction instead of committing on their own::
+
+        async with transaction():
+            for u in users:
+                await update_user(u.id, u.username)
+    """
+    current = _txn.get()
+    if current is not None:
+        yield current[0]
+        return
+    db = await get_db()
+    on_commit = []
+    async with _write_lock:
+        token = _txn.set((db, on_commit))
+        try:
+            await db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+                await db.commit()
+            except BaseException:
+                # COMMIT fail hua to bhi connection khula transaction na chhode
+                if db.in_transaction:
+                    await db.rollback()
+                _reset_caches()
+                raise
+        finally:
+            _txn.reset(token)
+    # Cache tabhi badlo jab data commit ho chuka ho (readers ko bhi wahi dikhe)
+    for callback in on_commit:
+        callback()
+
+def _after_commit(callback):
+    """Run `callback` once the running transaction commits (right away if there is none)."""
+    current = _txn.get()
+    if current is None:
+        callback()
+    else:
+        current[1].append(callback)
+
+def _reset_caches():
+    """Drop the admin/ban caches (e.g. after a rolled back transaction)."""
+    global _admin_ids, _admin_gen, _ban_gen
+    _admin_ids = None
+    _admin_gen += 1
+    _ban_cache.clear()
+    _ban_gen += 1
+
+async def close_db():
+    """Flush pending lookups and close all shared database connections."""
+    global _write_db, _read_dbs, _read_cycle, _writer_thread, _checkpoint_task
+    if _checkpoint_task is not None:
+        _checkpoint_task.cancel()
+        try:
+            await _checkpoint_task
+        except asyncio.CancelledError:
+            pass
+        _checkpoint_task = None
+    if _writer_thread is not None and _writer_thread.is_alive():
+        _write_q.put(_STOP)
+        await asyncio.to_thread(_writer_thread.join)
+    _writer_thread = None
+    async with _db_lock:
+        if _write_db is not None:
+            for read_db in _read_dbs:
+                await read_db.close()
+            await _write_db.close()
+            _write_db = None
+            _read_dbs = []
+            _read_cycle = None
+
+# Poora schema (tables, indexes, trigger) - sab IF NOT EXISTS, ek executescript me
+SCHEMA_SQL = '''
+-- Users table
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    first_seen INTEGER,
+    last_seen INTEGER,
+    total_lookups INTEGER DEFAULT 0,
+    username TEXT,
+    first_name TEXT,
+    last_name TEXT
+);
+-- Admins table
+CREATE TABLE IF NOT EXISTS admins (
+    user_id INTEGER PRIMARY KEY,
+    added_by INTEGER,
+    added_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+-- Banned table
+CREATE TABLE IF NOT EXISTS banned (
+    user_id INTEGER PRIMARY KEY,
+    reason TEXT,
+    banned_by INTEGER,
+    banned_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+-- Lookups table
+CREATE TABLE IF NOT EXISTS lookups (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER,
+    command TEXT,
+    query TEXT,
+    result BLOB,
+    timestamp INTEGER DEFAULT (strftime('%s', 'now'))
+);
+-- Daily stats table (day = unix epoch // 86400, UTC din)
+CREATE TABLE IF NOT EXISTS daily_stats (
+    day INTEGER,
+    command TEXT,
+    count INTEGER DEFAULT 0,
+    PRIMARY KEY(day, command)
+);
+-- Indexes (last_seen / total_lookups sort, per-user lookup history, command grouping)
+-- daily_stats ka PRIMARY KEY(day, command) hi day range ke liye index ka kaam karta hai
+CREATE INDEX IF NOT EXISTS idx_users_last_seen ON users(last_seen DESC);
+CREATE INDEX IF NOT EXISTS idx_users_total_lookups ON users(total_lookups DESC);
+CREATE INDEX IF NOT EXISTS idx_lookups_user_time ON lookups(user_id, timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_lookups_command ON lookups(command);
+-- Lookup insert pe user stats aur daily stats SQLite khud update karta hai
+CREATE TRIGGER IF NOT EXISTS trg_lookup_ai AFTER INSERT ON lookups BEGIN
+    UPDATE users SET total_lookups = total_lookups + 1 WHERE user_id = NEW.user_id;
+    INSERT INTO daily_stats (day, command, count) VALUES (NEW.timestamp / 86400, NEW.command, 1)
+        ON CONFLICT(day, command) DO UPDATE SET count = count + 1;
+END;
+'''
+
+def _bootstrap_schema():
+    """Create/upgrade the schema with plain sqlite3 (startup pe ek baar, aiosqlite se pehle)."""
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        conn.executescript(SCHEMA_SQL)
+        _migrate(conn)
+        # Query planner statistics (analysis_limit se bade tables pe bhi ANALYZE jaldi khatam hota hai)
+        conn.execute('PRAGMA analysis_limit=400')
+        conn.execute('ANALYZE')
+        conn.commit()
+    finally:
+        conn.close()
+
+def _migrate(conn):
+    """Bring an older database file up to SCHEMA_VERSION (runs once per version)."""
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version < 1:
+        # ISO string timestamps -> INTEGER unix epoch (users me local time, lookups me UTC tha)
+        conn.execute("UPDATE users SET first_seen = CAST(strftime('%s', first_seen, 'utc') AS INTEGER) WHERE typeof(first_seen) = 'text'")
+        conn.execute("UPDATE users SET last_seen = CAST(strftime('%s', last_seen, 'utc') AS INTEGER) WHERE typeof(last_seen) = 'text'")
+        conn.execute("UPDATE lookups SET timestamp = CAST(strftime('%s', timestamp) AS INTEGER) WHERE typeof(timestamp) = 'text'")
+        conn.commit()
+    if version < 2:
+        # daily_stats: TEXT date -> INTEGER day (purana trigger hata ke SCHEMA_SQL se naya banao)
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(daily_stats)')]
+        if 'date' in columns:
+            conn.executescript('''
+                BEGIN;
+                DROP TRIGGER IF EXISTS trg_lookup_ai;
+                CREATE TABLE daily_stats_new (
+                    day INTEGER,
+                    command TEXT,
+                    count INTEGER DEFAULT 0,
+                    PRIMARY KEY(day, command)
+                );
+                INSERT INTO daily_stats_new (day, command, count)
+                    SELECT CAST(strftime('%s', date) AS INTEGER) / 86400, command, SUM(count)
+                    FROM daily_stats GROUP BY 1, 2;
+                DROP TABLE daily_stats;
+                ALTER TABLE daily_stats_new RENAME TO daily_stats;
+                COMMIT;
+            ''')
+            conn.executescript(SCHEMA_SQL)
+    conn.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+    conn.commit()
 
 async def init_db():
-    """Initialize all database tables."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        # Users table
-        await db.execute('''CREATE TABLE IF NOT EXISTS users (
-            user_id INTEGER PRIMARY KEY,
-            first_seen TIMESTAMP,
-            last_seen TIMESTAMP,
-            total_lookups INTEGER DEFAULT 0,
-            username TEXT,
-            first_name TEXT,
-            last_name TEXT
-        )''')
-        # Admins table
-        await db.execute('''CREATE TABLE IF NOT EXISTS admins (
-            user_id INTEGER PRIMARY KEY,
-            added_by INTEGER,
-            added_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )''')
-        # Banned table
-        await db.execute('''CREATE TABLE IF NOT EXISTS banned (
-            user_id INTEGER PRIMARY KEY,
-            reason TEXT,
-            banned_by INTEGER,
-            banned_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )''')
-        # Lookups table
-        await db.execute('''CREATE TABLE IF NOT EXISTS lookups (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            command TEXT,
-            query TEXT,
-            result TEXT,
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )''')
-        # Daily stats table
-        await db.execute('''CREATE TABLE IF NOT EXISTS daily_stats (
-            date TEXT,
-            command TEXT,
-            count INTEGER DEFAULT 0,
-            PRIMARY KEY(date, command)
-        )''')
-        await db.commit()
+    """Initialize all database tables, then open the shared connections."""
+    await asyncio.to_thread(_bootstrap_schema)
+    await get_db()
+    global _writer_thread, _checkpoint_task
+    if _writer_thread is None or not _writer_thread.is_alive():
+        _writer_thread = threading.Thread(target=_writer_loop, name="lookup-writer", daemon=True)
+        _writer_thread.start()
+    if _checkpoint_task is None:
+        _checkpoint_task = asyncio.create_task(_checkpoint_loop())
+
+async def _checkpoint_loop():
+    """Background task: checkpoint and truncate the WAL every CHECKPOINT_INTERVAL."""
+    while True:
+        await asyncio.sleep(CHECKPOINT_INTERVAL)
+        try:
+            db = await get_db()
+            # write lock: apni hi open transaction ke beech checkpoint na chale
+            async with _write_lock:
+                await db.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        except Exception as e:
+            logger.error(f"WAL checkpoint failed: {e}")
 
 # ==================== USER FUNCTIONS ====================
 async def update_user(user_id, username=None, first_name=None, last_name=None):
     """Insert or update user information."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        now = datetime.now().isoformat()
-        await db.execute('''
-            INSERT INTO users (user_id, first_seen, last_seen, username, first_name, last_name)
-            VALUES (?, ?, ?, ?, ?, ?)
-            ON CONFLICT(user_id) DO UPDATE SET
-                last_seen=excluded.last_seen,
-                username=excluded.username,
-                first_name=excluded.first_name,
-                last_name=excluded.last_name
-        ''', (user_id, now, now, username, first_name, last_name))
-        await db.commit()
+    now = int(time.time())
+    async with transaction() as db:
+        await db.execute(SQL_UPDATE_USER, (user_id, now, now, username, first_name, last_name))
 
 async def get_user(user_id):
     """Get user by ID."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute('SELECT * FROM users WHERE user_id = ?', (user_id,)) as cursor:
-            return await cursor.fetchone()
+    db = await get_reader()
+    rows = await db.execute_fetchall(SQL_GET_USER, (user_id,))
+    return rows[0] if rows else None
 
 async def get_all_users(limit=100, offset=0):
     """Get paginated list of users."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute(
-            'SELECT user_id, username, first_name, total_lookups, last_seen FROM users ORDER BY last_seen DESC LIMIT ? OFFSET ?',
-            (limit, offset)
-        ) as cursor:
-            return await cursor.fetchall()
+    db = await get_reader()
+    return await db.execute_fetchall(
+        'SELECT user_id, username, first_name, total_lookups, last_seen FROM users ORDER BY last_seen DESC LIMIT ? OFFSET ?',
+        (limit, offset)
+    )
 
 async def get_recent_users(days=7):
     """Get users active in last N days."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        cutoff = (datetime.now() - timedelta(days=days)).isoformat()
-        async with db.execute(
-            'SELECT user_id, username, last_seen FROM users WHERE last_seen >= ?',
-            (cutoff,)
-        ) as cursor:
-            return await cursor.fetchall()
+    db = await get_reader()
+    cutoff = int(time.time()) - days * 86400
+    return await db.execute_fetchall(
+        'SELECT user_id, username, last_seen FROM users WHERE last_seen >= ?',
+        (cutoff,)
+    )
 
 async def get_inactive_users(days=30):
     """Get users not active in last N days."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        cutoff = (datetime.now() - timedelta(days=days)).isoformat()
-        async with db.execute(
-            'SELECT user_id, username, last_seen FROM users WHERE last_seen < ?',
-            (cutoff,)
-        ) as cursor:
-            return await cursor.fetchall()
+    db = await get_reader()
+    cutoff = int(time.time()) - days * 86400
+    return await db.execute_fetchall(
+        'SELECT user_id, username, last_seen FROM users WHERE last_seen < ?',
+        (cutoff,)
+    )
 
 # ==================== ADMIN FUNCTIONS ====================
 async def is_admin(user_id):
-    """Check if user is an admin."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute('SELECT 1 FROM admins WHERE user_id = ?', (user_id,)) as cursor:
-            return await cursor.fetchone() is not None
+    """Check if user is an admin (served from the in-memory admin set)."""
+    global _admin_ids
+    if _admin_ids is None:
+        gen = _admin_gen
+        admins = await get_all_admins()
+        if gen == _admin_gen:
+            _admin_ids = admins
+        return user_id in admins
+    return user_id in _admin_ids
+
+def _admin_changed(user_id, admin):
+    """Update the admin set after a committed add/remove."""
+    global _admin_gen
+    _admin_gen += 1
+    if _admin_ids is not None:
+        if admin:
+            _admin_ids.add(user_id)
+        else:
+            _admin_ids.discard(user_id)
 
 async def add_admin(user_id, added_by):
     """Add a new admin."""
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with transaction() as db:
         await db.execute('INSERT OR IGNORE INTO admins (user_id, added_by) VALUES (?, ?)', (user_id, added_by))
-        await db.commit()
+        _after_commit(functools.partial(_admin_changed, user_id, True))
 
 async def remove_admin(user_id):
     """Remove an admin."""
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with transaction() as db:
         await db.execute('DELETE FROM admins WHERE user_id = ?', (user_id,))
-        await db.commit()
+        _after_commit(functools.partial(_admin_changed, user_id, False))
 
 async def get_all_admins():
-    """Get list of all admin user_ids."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute('SELECT user_id FROM admins') as cursor:
-            rows = await cursor.fetchall()
-            return [row[0] for row in rows]
+    """Get set of all admin user_ids."""
+    db = await get_reader()
+    rows = await db.execute_fetchall('SELECT user_id FROM admins')
+    return {row[0] for row in rows}
 
 # ==================== BAN FUNCTIONS ====================
+def _cached_ban(user_id):
+    """Return the cached ban flag, or None if missing/expired."""
+    entry = _ban_cache.get(user_id)
+    if entry is not None and entry[1] > time.monotonic():
+        return entry[0]
+    return None
+
+def _cache_ban(user_id, banned, gen):
+    """Remember a ban flag unless a ban/unban happened since `gen` was read."""
+    if gen == _ban_gen:
+        if len(_ban_cache) >= BAN_CACHE_SIZE:
+            _ban_cache.clear()
+        _ban_cache[user_id] = (banned, time.monotonic() + BAN_CACHE_TTL)
+
 async def is_banned(user_id):
-    """Check if user is banned."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute('SELECT 1 FROM banned WHERE user_id = ?', (user_id,)) as cursor:
-            return await cursor.fetchone() is not None
+    """Check if user is banned (cached for BAN_CACHE_TTL seconds)."""
+    banned = _cached_ban(user_id)
+    if banned is not None:
+        return banned
+    gen = _ban_gen
+    db = await get_reader()
+    banned = bool(await db.execute_fetchall(SQL_IS_BANNED, (user_id,)))
+    _cache_ban(user_id, banned, gen)
+    return banned
+
+def _ban_changed(user_id):
+    """Invalidate a user's cached ban flag after a committed ban/unban."""
+    global _ban_gen
+    _ban_gen += 1
+    _ban_cache.pop(user_id, None)
 
 async def ban_user(user_id, reason, banned_by):
     """Ban a user."""
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with transaction() as db:
         await db.execute('INSERT INTO banned (user_id, reason, banned_by) VALUES (?, ?, ?)',
                          (user_id, reason, banned_by))
-        await db.commit()
+        _after_commit(functools.partial(_ban_changed, user_id))
 
 async def unban_user(user_id):
     """Unban a user."""
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with transaction() as db:
         await db.execute('DELETE FROM banned WHERE user_id = ?', (user_id,))
-        await db.commit()
+        _after_commit(functools.partial(_ban_changed, user_id))
+
+async def get_user_flags(user_id):
+    """Return (is_banned, is_admin) for a user; both are cache-backed, so warm calls skip the DB."""
+    return await is_banned(user_id), await is_admin(user_id)
 
 # ==================== LOOKUP FUNCTIONS ====================
 async def save_lookup(user_id, command, query, result):
-    """Save a lookup record and update user stats."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            'INSERT INTO lookups (user_id, command, query, result) VALUES (?, ?, ?, ?)',
-            (user_id, command, query, json.dumps(result))
-        )
-        await db.execute('UPDATE users SET total_lookups = total_lookups + 1 WHERE user_id = ?', (user_id,))
-        # Update daily stats
-        date = datetime.now().strftime('%Y-%m-%d')
-        await db.execute('''
-            INSERT INTO daily_stats (date, command, count) VALUES (?, ?, 1)
-            ON CONFLICT(date, command) DO UPDATE SET count = count + 1
-        ''', (date, command))
-        await db.commit()
+    """Queue a lookup record for the writer thread (trigger updates the stats)."""
+    # orjson bytes; writer thread inhe zstd karke BLOB me likhta hai
+    result = orjson.dumps(result, option=orjson.OPT_NON_STR_KEYS)
+    _write_q.put_nowait((user_id, command, query, result, int(time.time())))
+
+@functools.lru_cache(maxsize=None)
+def _multi_insert_sql(n):
+    """INSERT INTO lookups ... VALUES with n row placeholders (built once per n)."""
+    return SQL_INSERT_LOOKUPS + ', '.join([SQL_LOOKUP_ROW] * n)
+
+def _write_lookups(conn, batch):
+    """Write a batch of queued lookups in one transaction (trg_lookup_ai updates the stats)."""
+    rows = [
+        (user_id, command, query, _cctx.compress(result), timestamp)
+        for user_id, command, query, result, timestamp in batch
+    ]
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        i = 0
+        for size in LOOKUP_INSERT_BUCKETS:
+            sql = _multi_insert_sql(size)
+            while len(rows) - i >= size:
+                conn.execute(sql, tuple(itertools.chain.from_iterable(rows[i:i + size])))
+                i += size
+        if i < len(rows):
+            conn.executemany(_multi_insert_sql(1), rows[i:])
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+
+def _write_batch(conn, batch):
+    """Write a batch, retrying it on DB-wide errors and row by row on per-row errors."""
+    for attempt in range(LOOKUP_RETRIES + 1):
+        try:
+            _write_lookups(conn, batch)
+            return
+        except sqlite3.OperationalError as e:
+            # busy/disk/I-O: har row alag likhne se kuch nahi sudhrega, thoda ruk ke poora batch dobara
+            if attempt == LOOKUP_RETRIES:
+                logger.error(f"Dropping lookup batch ({len(batch)} rows) after {attempt + 1} attempts: {e}")
+                return
+            logger.warning(f"Lookup batch write failed, retrying: {e}")
+            time.sleep(LOOKUP_RETRY_DELAY * 2 ** attempt)
+        except (sqlite3.IntegrityError, sqlite3.InterfaceError, sqlite3.ProgrammingError) as e:
+            # Kisi ek row ki galti: baaki rows bacha lo, sirf kharab wali chhodo
+            logger.error(f"Lookup batch ({len(batch)} rows) rejected, writing one by one: {e}")
+            for row in batch:
+                try:
+                    _write_lookups(conn, [row])
+                except sqlite3.Error as e:
+                    logger.error(f"Failed to write lookup for user {row[0]}: {e}")
+            return
+        except Exception as e:
+            logger.error(f"Dropping lookup batch ({len(batch)} rows): {e}")
+            return
+
+def _writer_loop():
+    """Writer thread: drain _write_q in batches (every interval or LOOKUP_BATCH_SIZE rows)."""
+    conn = sqlite3.connect(DB_PATH, isolation_level=None, cached_statements=STATEMENT_CACHE_SIZE)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    stop = False
+    try:
+        while not stop:
+            batch = [_write_q.get()]
+            deadline = time.monotonic() + LOOKUP_FLUSH_INTERVAL
+            while batch[-1] is not _STOP and len(batch) < LOOKUP_BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(_write_q.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            if batch[-1] is _STOP:
+                stop = True
+                batch.pop()
+            try:
+                if batch:
+                    _write_batch(conn, batch)
+            finally:
+                for _ in range(len(batch) + stop):
+                    _write_q.task_done()
+    finally:
+        conn.close()
+
+def load_result(value):
+    """Decode a stored lookups.result (zstd BLOB, or older plain JSON text/bytes)."""
+    if isinstance(value, bytes) and value[:4] == ZSTD_MAGIC:
+        value = _dctx.decompress(value)
+    return orjson.loads(value)
+
+async def flush_lookups():
+    """Wait until every queued lookup has been written."""
+    if _writer_thread is not None and _writer_thread.is_alive():
+        await asyncio.to_thread(_write_q.join)
 
 async def get_user_lookups(user_id, limit=10):
     """Get recent lookups of a user."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute(
-            'SELECT command, query, timestamp FROM lookups WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?',
-            (user_id, limit)
-        ) as cursor:
-            return await cursor.fetchall()
+    db = await get_reader()
+    return await db.execute_fetchall(
+        'SELECT command, query, timestamp FROM lookups WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?',
+        (user_id, limit)
+    )
 
 async def get_leaderboard(limit=10):
     """Get top users by total lookups."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute(
-            'SELECT user_id, total_lookups FROM users ORDER BY total_lookups DESC LIMIT ?',
-            (limit,)
-        ) as cursor:
-            return await cursor.fetchall()
+    db = await get_reader()
+    return await db.execute_fetchall(
+        'SELECT user_id, total_lookups FROM users ORDER BY total_lookups DESC LIMIT ?',
+        (limit,)
+    )
 
 # ==================== STATISTICS FUNCTIONS ====================
 async def get_stats():
     """Get overall bot statistics."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        # total users
-        async with db.execute('SELECT COUNT(*) FROM users') as cursor:
-            total_users = (await cursor.fetchone())[0]
-        # total lookups
-        async with db.execute('SELECT SUM(total_lookups) FROM users') as cursor:
-            total_lookups = (await cursor.fetchone())[0] or 0
-        # total admins
-        async with db.execute('SELECT COUNT(*) FROM admins') as cursor:
-            total_admins = (await cursor.fetchone())[0]
-        # total banned
-        async with db.execute('SELECT COUNT(*) FROM banned') as cursor:
-            total_banned = (await cursor.fetchone())[0]
-        return {
-            "total_users": total_users,
-            "total_lookups": total_lookups,
-            "total_admins": total_admins,
-            "total_banned": total_banned
-        }
+    db = await get_reader()
+    rows = await db.execute_fetchall('''
+        SELECT
+            (SELECT COUNT(*) FROM users),
+            (SELECT SUM(total_lookups) FROM users),
+            (SELECT COUNT(*) FROM admins),
+            (SELECT COUNT(*) FROM banned)
+    ''')
+    total_users, total_lookups, total_admins, total_banned = rows[0]
+    return {
+        "total_users": total_users,
+        "total_lookups": total_lookups or 0,
+        "total_admins": total_admins,
+        "total_banned": total_banned
+    }
 
 async def get_daily_stats(days=7):
     """Get daily stats for the last N days."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute(
-            'SELECT date, command, count FROM daily_stats WHERE date >= date("now", "-? days") ORDER BY date DESC',
-            (days,)
-        ) as cursor:
-            return await cursor.fetchall()
+    db = await get_reader()
+    cutoff = int(time.time()) // 86400 - days
+    return await db.execute_fetchall(
+        "SELECT date(day * 86400, 'unixepoch'), command, count FROM daily_stats WHERE day >= ? ORDER BY day DESC",
+        (cutoff,)
+    )
 
 async def get_lookup_stats(limit=10):
     """Get command-wise lookup counts."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute(
-            'SELECT command, COUNT(*) as cnt FROM lookups GROUP BY command ORDER BY cnt DESC LIMIT ?',
-            (limit,)
-        ) as cursor:
-            return await cursor.fetchall()
+    db = await get_reader()
+    return await db.execute_fetchall(
+        'SELECT command, COUNT(*) as cnt FROM lookups GROUP BY command ORDER BY cnt DESC LIMIT ?',
+        (limit,)
+    )
+
+# ==================== BACKUP FUNCTIONS ====================
+def _backup_to(path):
+    """Copy the live database (WAL ke committed pages samet) into `path`."""
+    src = sqlite3.connect(DB_PATH)
+    dst = sqlite3.connect(path)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+async def backup_db(path):
+    """Write a consistent snapshot of the database to `path` (sqlite backup API)."""
+    await asyncio.to_thread(_backup_to, path)
@@ -14,6 +14,7 @@ import threading
 import html
 import aiohttp
 import io
+import tempfile
 from datetime import datetime
 from flask import Flask, jsonify
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
@@ -94,6 +95,10 @@ def store_copy_data(data):
     copy_cache[uid] = {"data": data, "time": time.time()}
     return uid
 
+def format_ts(ts):
+    """Unix epoch (DB timestamps) -> readable local time."""
+    return datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S') if ts else 'N/A'
+
 def get_copy_button(data):
     return InlineKeyboardButton("📋 Copy", callback_data=f"copy:{store_copy_data(data)}")
 
@@ -170,9 +175,12 @@ async def force_join_filter(update: Update, context: ContextTypes.DEFAULT_TYPE)
     user = update.effective_user
     if not user:
         return True
-    if user.id == OWNER_ID or await is_admin(user.id):
+    if user.id == OWNER_ID:
+        return True
+    banned, admin = await get_user_flags(user.id)
+    if admin:
         return True
-    if await is_banned(user.id):
+    if banned:
         await update.message.reply_text("❌ **Aap banned hain. Contact admin.**", parse_mode='Markdown')
         return False
     ok, missing = await check_force_join(context.bot, user.id)
@@ -266,9 +274,8 @@ async def handle_pending_action(update: Update, context: ContextTypes.DEFAULT_TY
             await update.message.reply_text(f"❌ **Failed to send message: {e}**", parse_mode='Markdown')
 
     elif action == "broadcast":
-        async with aiosqlite.connect(DB_PATH) as db:
-            async with db.execute('SELECT user_id FROM users') as cursor:
-                users = await cursor.fetchall()
+        db = await get_reader()
+        users = await db.execute_fetchall('SELECT user_id FROM users')
         success = 0
         fail = 0
         for (uid,) in users:
@@ -449,9 +456,8 @@ async def unban(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def delete_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         uid = int(context.args[0])
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with transaction() as db:
             await db.execute('DELETE FROM users WHERE user_id = ?', (uid,))
-            await db.commit()
         await update.message.reply_text(f"✅ User {uid} deleted from database.")
     except (IndexError, ValueError):
         await update.message.reply_text("Usage: /deleteuser <user_id>")
@@ -463,23 +469,20 @@ async def search_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = ' '.join(context.args)
     try:
         uid = int(query)
-        async with aiosqlite.connect(DB_PATH) as db:
-            async with db.execute('SELECT * FROM users WHERE user_id = ?', (uid,)) as cursor:
-                user = await cursor.fetchone()
+        user = await get_user(uid)
         if user:
-            text = f"User found:\nID: {user[0]}\nUsername: @{user[4] or 'N/A'}\nName: {user[5] or ''} {user[6] or ''}\nLookups: {user[3]}\nLast seen: {user[2]}"
+            text = f"User found:\nID: {user['user_id']}\nUsername: @{user['username'] or 'N/A'}\nName: {user['first_name'] or ''} {user['last_name'] or ''}\nLookups: {user['total_lookups']}\nLast seen: {format_ts(user['last_seen'])}"
         else:
             text = "User not found."
         await update.message.reply_text(text)
         return
     except ValueError:
         pass
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute(
-            "SELECT user_id, username, first_name, last_name FROM users WHERE username LIKE ? OR first_name LIKE ? OR last_name LIKE ? LIMIT 10",
-            (f'%{query}%', f'%{query}%', f'%{query}%')
-        ) as cursor:
-            results = await cursor.fetchall()
+    db = await get_reader()
+    results = await db.execute_fetchall(
+        "SELECT user_id, username, first_name, last_name FROM users WHERE username LIKE ? OR first_name LIKE ? OR last_name LIKE ? LIMIT 10",
+        (f'%{query}%', f'%{query}%', f'%{query}%')
+    )
     if results:
         text = "Search results:\n"
         for r in results:
@@ -508,7 +511,7 @@ async def recent_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
     users_list = await get_recent_users(days)
     text = f"📅 Users active in last {days} days:\n"
     for u in users_list:
-        text += f"• {u[0]} (@{u[1] or 'N/A'}) - last seen {u[2]}\n"
+        text += f"• {u[0]} (@{u[1] or 'N/A'}) - last seen {format_ts(u[2])}\n"
     await update.message.reply_text(text)
 
 @admin_only
@@ -517,7 +520,7 @@ async def inactive_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
     users_list = await get_inactive_users(days)
     text = f"💤 Users inactive for >{days} days:\n"
     for u in users_list:
-        text += f"• {u[0]} (@{u[1] or 'N/A'}) - last seen {u[2]}\n"
+        text += f"• {u[0]} (@{u[1] or 'N/A'}) - last seen {format_ts(u[2])}\n"
     await update.message.reply_text(text)
 
 @admin_only
@@ -527,7 +530,7 @@ async def user_lookups(update: Update, context: ContextTypes.DEFAULT_TYPE):
         lookups = await get_user_lookups(uid, 10)
         text = f"📊 Last 10 lookups of {uid}:\n"
         for cmd, q, ts in lookups:
-            text += f"{ts} - /{cmd} {q}\n"
+            text += f"{format_ts(ts)} - /{cmd} {q}\n"
         await update.message.reply_text(text)
     except (IndexError, ValueError):
         await update.message.reply_text("Usage: /userlookups <user_id>")
@@ -591,7 +594,7 @@ async def remove_admin_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 @owner_only
 async def list_admins(update: Update, context: ContextTypes.DEFAULT_TYPE):
     admins = await get_all_admins()
-    text = "👑 Admins:\n" + "\n".join(str(a) for a in admins)
+    text = "👑 Admins:\n" + "\n".join(str(a) for a in sorted(admins))
     await update.message.reply_text(text)
 
 @owner_only
@@ -600,23 +603,36 @@ async def settings(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 @owner_only
 async def full_db_backup(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    with open(DB_PATH, 'rb') as f:
-        await update.message.reply_document(f, filename='osint_bot_backup.db')
+    # Raw file copy me WAL ke writes nahi hote, isliye backup API se snapshot banao
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        await flush_lookups()  # queue me pade lookups bhi backup me aaye
+        await backup_db(path)
+        with open(path, 'rb') as f:
+            await update.message.reply_document(f, filename='osint_bot_backup.db')
+    finally:
+        os.remove(path)
 
 # ==================== BOT INITIALIZATION ====================
 async def post_init(app: Application):
     await init_db()
-    for aid in INITIAL_ADMINS:
-        await add_admin(aid, OWNER_ID)
+    async with transaction():
+        for aid in INITIAL_ADMINS:
+            await add_admin(aid, OWNER_ID)
     logger.info("✅ Bot initialized, database ready.")
 
+async def post_shutdown(app: Application):
+    await close_db()
+    logger.info("🛑 Database connection closed.")
+
 def run_bot():
     try:
         if not BOT_TOKEN or BOT_TOKEN == "YOUR_BOT_TOKEN_HERE":
             logger.error("❌ BOT_TOKEN not set!")
             return
 
-        bot_app = Application.builder().token(BOT_TOKEN).post_init(post_init).build()
+        bot_app = Application.builder().token(BOT_TOKEN).post_init(post_init).post_shutdown(post_shutdown).build()
 
         # Command handlers
         bot_app.add_handler(CommandHandler("start", start))